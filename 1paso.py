@@ -2,80 +2,133 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import os
 import re
+import sys
 from datetime import datetime
+from functools import lru_cache
+from multiprocessing import Pool
 from typing import Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
 # =============== REGEX: detección y canonización ===============
+# Mapeo directo variante (en minúsculas) → forma canónica.
+# Es la fuente única de variantes: de aquí se genera la alternación de
+# TIPO_INICIO_RE y permite canonizar columnas completas con Series.map.
+VARIANT_TO_CANON = {
+    "av": "Avenida", "av.": "Avenida", "avenida": "Avenida",
+    "calle": "Calle", "cal": "Calle", "cal.": "Calle", "c.": "Calle",
+    "bulevar": "Bulevar", "bulvar": "Bulevar", "boulevard": "Bulevar", "blvd": "Bulevar", "blvd.": "Bulevar",
+    "cto": "Circuito", "cto.": "Circuito", "circuito": "Circuito",
+    "camino": "Camino", "cam": "Camino", "cam.": "Camino",
+    "calzada": "Calzada", "calz": "Calzada", "calz.": "Calzada",
+    "prol": "Prolongación", "prol.": "Prolongación", "prolongacion": "Prolongación", "prolongación": "Prolongación",
+    "privada": "Privada", "priv": "Privada", "priv.": "Privada",
+    "cerrada": "Cerrada", "cerr": "Cerrada", "cerr.": "Cerrada",
+    "cjon": "Callejón", "cjon.": "Callejón",
+    "callejon": "Callejón", "callejon.": "Callejón", "callejón": "Callejón", "callejón.": "Callejón",
+    "andador": "Andador", "and": "Andador", "and.": "Andador",
+    "carretera": "Carretera", "carr": "Carretera", "carr.": "Carretera", "cte": "Carretera", "cte.": "Carretera",
+    "eje": "Eje",
+    "paseo": "Paseo", "psje": "Paseo", "psje.": "Paseo", "pseo": "Paseo",
+    "anillo": "Anillo",
+    "via": "Vía", "vía": "Vía",
+    "periferico": "Periférico", "periférico": "Periférico", "perif": "Periférico", "perif.": "Periférico",
+    "viaducto": "Viaducto", "viad": "Viaducto", "viad.": "Viaducto",
+    "aldea": "Aldea",
+}
+
 # Detecta tipo de vía al **inicio** de "calle" y separa el nombre.
+# Alternación generada desde VARIANT_TO_CANON: variantes únicas, escapadas y
+# ordenadas de mayor a menor longitud ("calle" gana sobre "cal"), lo que
+# compacta el autómata y evita backtracking entre variantes que son prefijo
+# una de otra. Se mantiene el case-folding Unicode porque hay variantes
+# acentuadas (vía, callejón, ...).
+_VARIANTES_ORDENADAS = sorted(set(map(re.escape, VARIANT_TO_CANON)), key=len, reverse=True)
 TIPO_INICIO_RE = re.compile(
-    r"""^\s*
-        (?P<tipo>
-            av(?:\.|enida)?|
-            cal(?:le|\.?)|c\.(?=\s)|
-            bule?var|boulevard|blvd\.?|
-            cto\.?|circuito|
-            cam(?:ino|\.?)|
-            calz(?:ada|\.?)|
-            prol(?:\.|ongaci[oó]n)?|
-            priv(?:ada|\.?)|
-            cerr(?:ada|\.?)|
-            c(?:jon|allej[oó]n)\.?|
-            and(?:ador|\.?)|
-            carretera|carr\.?|cte\.?|
-            eje|
-            paseo|psje\.?|pseo|
-            anillo|
-            v[ií]a|
-            perif(?:[eé]rico|\.?)|
-            viad(?:ucto|\.?)|
-            aldea
-        )
-        \s+  # al menos un espacio entre el tipo y el nombre
-        (?P<nombre>.+)$
-    """,
-    re.IGNORECASE | re.VERBOSE
+    r"^\s*(?P<tipo>" + "|".join(_VARIANTES_ORDENADAS) + r")"
+    r"\s+(?P<nombre>.+)$",  # al menos un espacio entre el tipo y el nombre
+    re.IGNORECASE
 )
 
-# Reglas de canonización (solo regex → forma canónica)
-CANON_RULES = [
-    (re.compile(r'^(?:av(?:\.|enida)?)$', re.IGNORECASE), "Avenida"),
-    (re.compile(r'^(?:cal(?:le|\.?)|c\.)$', re.IGNORECASE), "Calle"),
-    (re.compile(r'^(?:bule?var|boulevard|blvd\.?)$', re.IGNORECASE), "Bulevar"),
-    (re.compile(r'^(?:cto\.?|circuito)$', re.IGNORECASE), "Circuito"),
-    (re.compile(r'^(?:cam(?:ino|\.?))$', re.IGNORECASE), "Camino"),
-    (re.compile(r'^(?:calz(?:ada|\.?))$', re.IGNORECASE), "Calzada"),
-    (re.compile(r'^(?:prol(?:\.|ongaci[oó]n)?)$', re.IGNORECASE), "Prolongación"),
-    (re.compile(r'^(?:priv(?:ada|\.?))$', re.IGNORECASE), "Privada"),
-    (re.compile(r'^(?:cerr(?:ada|\.?))$', re.IGNORECASE), "Cerrada"),
-    (re.compile(r'^(?:c(?:jon|allej[oó]n)\.?)$', re.IGNORECASE), "Callejón"),
-    (re.compile(r'^(?:and(?:ador|\.?))$', re.IGNORECASE), "Andador"),
-    (re.compile(r'^(?:carretera|carr\.?|cte\.?)$', re.IGNORECASE), "Carretera"),
-    (re.compile(r'^(?:eje)$', re.IGNORECASE), "Eje"),
-    (re.compile(r'^(?:paseo|psje\.?|pseo)$', re.IGNORECASE), "Paseo"),
-    (re.compile(r'^(?:anillo)$', re.IGNORECASE), "Anillo"),
-    (re.compile(r'^(?:v[ií]a)$', re.IGNORECASE), "Vía"),
-    (re.compile(r'^(?:perif(?:[eé]rico|\.?))$', re.IGNORECASE), "Periférico"),
-    (re.compile(r'^(?:viad(?:ucto|\.?))$', re.IGNORECASE), "Viaducto"),
-    (re.compile(r'^(?:aldea)$', re.IGNORECASE), "Aldea"),
+# Variante sin IGNORECASE para el camino escalar: la entrada se baja a
+# minúsculas una sola vez (las variantes ya lo están) y el motor se ahorra el
+# case-folding por carácter en cada transición.
+TIPO_INICIO_LC_RE = re.compile(TIPO_INICIO_RE.pattern)
+
+# Reglas de canonización (solo regex → forma canónica), compiladas como una
+# sola alternación con grupos nombrados: un único match identifica la clase
+# canónica vía m.lastgroup, en lugar de recorrer ~20 regex por llamada.
+CANON_GROUPS = [
+    # (nombre de grupo ASCII, forma canónica, patrón de variantes)
+    ("Avenida",      "Avenida",      r"av(?:\.|enida)?"),
+    ("Calle",        "Calle",        r"cal(?:le|\.?)|c\."),
+    ("Bulevar",      "Bulevar",      r"bule?var|boulevard|blvd\.?"),
+    ("Circuito",     "Circuito",     r"cto\.?|circuito"),
+    ("Camino",       "Camino",       r"cam(?:ino|\.?)"),
+    ("Calzada",      "Calzada",      r"calz(?:ada|\.?)"),
+    ("Prolongacion", "Prolongación", r"prol(?:\.|ongaci[oó]n)?"),
+    ("Privada",      "Privada",      r"priv(?:ada|\.?)"),
+    ("Cerrada",      "Cerrada",      r"cerr(?:ada|\.?)"),
+    ("Callejon",     "Callejón",     r"c(?:jon|allej[oó]n)\.?"),
+    ("Andador",      "Andador",      r"and(?:ador|\.?)"),
+    ("Carretera",    "Carretera",    r"carretera|carr\.?|cte\.?"),
+    ("Eje",          "Eje",          r"eje"),
+    ("Paseo",        "Paseo",        r"paseo|psje\.?|pseo"),
+    ("Anillo",       "Anillo",       r"anillo"),
+    ("Via",          "Vía",          r"v[ií]a"),
+    ("Periferico",   "Periférico",   r"perif(?:[eé]rico|\.?)"),
+    ("Viaducto",     "Viaducto",     r"viad(?:ucto|\.?)"),
+    ("Aldea",        "Aldea",        r"aldea"),
 ]
+GROUP_TO_CANON = {grupo: canon for grupo, canon, _ in CANON_GROUPS}
+
+# Internar las formas canónicas: tras la limpieza se repiten millones de veces
+# y, internadas, las comparaciones de igualdad resuelven por identidad de
+# puntero sin comparar contenido.
+for _d in (VARIANT_TO_CANON, GROUP_TO_CANON):
+    for _k in _d:
+        _d[_k] = sys.intern(_d[_k])
+CANON_RE = re.compile(
+    "|".join(f"(?P<{grupo}>(?:{patron}))" for grupo, _, patron in CANON_GROUPS),
+    re.IGNORECASE
+)
+
+# Aliases a nivel de módulo para el camino caliente: evitan re-resolver el
+# atributo (LOAD_ATTR del método) en cada llamada de limpiar_par.
+_TIPO_MATCH = TIPO_INICIO_RE.match
+_TIPO_MATCH_LC = TIPO_INICIO_LC_RE.match
+_BUSCAR_VARIANTE = VARIANT_TO_CANON.get
 
+# Tupla de variantes para el filtro negativo con str.startswith: rechaza en C
+# la gran mayoría de calles que no inician con tipo de vía, sin tocar el regex.
+VARIANT_PREFIXES = tuple(VARIANT_TO_CANON)
+
+@lru_cache(maxsize=200_000)
 def canonizar_tipo(tipo: Optional[str]) -> Optional[str]:
-    """Canoniza el tipo_via usando solo regex. Si viene 'Avenida Reforma', extrae 'Avenida'."""
+    """Canoniza el tipo_via usando solo regex. Si viene 'Avenida Reforma', extrae 'Avenida'.
+
+    Los datos reales repiten muchísimo los mismos valores, así que el lru_cache
+    convierte las llamadas repetidas en un lookup de diccionario."""
     if not isinstance(tipo, str) or not tipo.strip():
         return tipo
     t = tipo.strip()
 
+    # Camino rápido: variante exacta conocida → lookup O(1), sin regex
+    canon = VARIANT_TO_CANON.get(t.lower())
+    if canon:
+        return canon
+
     # Si trae también el nombre en el mismo campo, intenta separar con la misma regex
     m = TIPO_INICIO_RE.match(t)
     if m:
         t = m.group("tipo")
 
-    for rx, canon in CANON_RULES:
-        if rx.match(t):
-            return canon
+    m = CANON_RE.fullmatch(t)
+    if m:
+        return GROUP_TO_CANON[m.lastgroup]
     return t  # sin cambio conocido
 
 def limpiar_par(tipo_via: Optional[str], calle: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
@@ -84,40 +137,117 @@ def limpiar_par(tipo_via: Optional[str], calle: Optional[str]) -> Tuple[Optional
     - Si no, solo canoniza 'tipo_via'.
     - Si 'tipo_via' y 'calle' son iguales, reintenta separar desde 'calle'.
     """
+    # Normalizar una sola vez: cada .strip()/.lower() repetido aloca un str
+    # nuevo y esta función corre millones de veces.
+    c = calle.strip() if isinstance(calle, str) else calle
+    c_lc = None
+
     # 1) Intentar extraer desde el inicio de "calle"
-    if isinstance(calle, str) and calle.strip():
-        m = TIPO_INICIO_RE.match(calle.strip())
-        if m:
-            tipo_raw = m.group("tipo")
-            nombre = m.group("nombre").strip()
-            tipo_canon = canonizar_tipo(tipo_raw)
-            return tipo_canon, nombre
+    if isinstance(c, str) and c:
+        # Una sola bajada a minúsculas para todo el análisis del valor.
+        c_lc = c.lower()
+        # Camino rápido: si el primer token es una variante conocida, el par
+        # se resuelve con un lookup de diccionario sin invocar el regex.
+        i = c_lc.find(" ")
+        if i > 0:
+            canon = _BUSCAR_VARIANTE(c_lc[:i])
+            if canon:
+                resto = c[i + 1:].strip()
+                if resto:
+                    return canon, resto
+        # Filtro negativo barato: si la calle ni siquiera empieza con alguna
+        # variante, no hay match posible y no vale la pena invocar el regex
+        # (el caso dominante en datos reales).
+        if c_lc.startswith(VARIANT_PREFIXES):
+            # El regex sin IGNORECASE corre sobre c_lc y los spans indexan el
+            # original c (lower() conserva longitudes salvo Unicode exótico).
+            m = _TIPO_MATCH_LC(c_lc) if len(c_lc) == len(c) else _TIPO_MATCH(c)
+            if m:
+                tipo_canon = canonizar_tipo(m.group("tipo"))
+                nombre = c[m.start("nombre"):m.end("nombre")].strip()
+                return tipo_canon, nombre
 
     # 2) Canonizar tipo_via
     tipo_canon = canonizar_tipo(tipo_via)
 
     # 3) Caso sucio: tipo_via == calle → reintentar
-    if isinstance(tipo_via, str) and isinstance(calle, str):
-        if tipo_via.strip().lower() == calle.strip().lower():
-            m2 = TIPO_INICIO_RE.match(calle.strip())
+    if isinstance(tipo_via, str) and c_lc is not None:
+        if tipo_via.strip().lower() == c_lc:
+            m2 = _TIPO_MATCH(c)
             if m2:
                 return canonizar_tipo(m2.group("tipo")), m2.group("nombre").strip()
 
     # 4) Sin cambios estructurales
-    return tipo_canon, (calle.strip() if isinstance(calle, str) else calle)
+    return tipo_canon, c
+
+def _map_unicos(serie: pd.Series, func) -> pd.Series:
+    """
+    Aplica func solo sobre los valores únicos de la serie y reexpande el
+    resultado por códigos (pd.factorize): N_filas llamadas se reducen a
+    N_únicos, que en columnas como tipo_via son un puñado.
+    """
+    codes, uniques = pd.factorize(serie, use_na_sentinel=False)
+    mapped = np.asarray([func(u) for u in uniques], dtype=object)
+    return pd.Series(np.take(mapped, codes), index=serie.index)
 
 # ================= CSV workflow =================
-def process_csv(input_path: str, output_path: Optional[str], sep: str, encoding: str,
-                preview: int, export: str):
+CHUNKSIZE = 100_000  # filas por chunk: acota la memoria pico a un solo chunk
+
+def _leer_chunks_pyarrow(input_path: str, sep: str, encoding: str, chunksize: int):
     """
-    export: 'all' (todas las filas, con cambios aplicados) o 'changed' (solo filas modificadas).
+    Itera el CSV como DataFrames de texto con pyarrow.csv.open_csv (el lector
+    streaming multihilo; pandas no acepta chunksize con engine="pyarrow").
+    Todas las columnas se fuerzan a string sin nulos, el equivalente de
+    dtype=str + keep_default_na=False en el parser de pandas.
+    """
+    import pyarrow as pa
+    from pyarrow import csv as pacsv
+
+    columnas = pd.read_csv(input_path, sep=sep, encoding=encoding, nrows=0).columns
+    try:
+        lector = pacsv.open_csv(
+            input_path,
+            # block_size es en bytes; ~64 bytes/fila aproxima el chunksize pedido
+            read_options=pacsv.ReadOptions(encoding=encoding, block_size=max(1 << 20, chunksize * 64)),
+            parse_options=pacsv.ParseOptions(delimiter=sep),
+            convert_options=pacsv.ConvertOptions(
+                column_types={c: pa.string() for c in columnas},
+                null_values=[],
+                strings_can_be_null=False,
+            ),
+        )
+        with lector:
+            for lote in lector:
+                yield lote.to_pandas()
+    except pa.ArrowInvalid as exc:
+        if "UTF8" not in str(exc):
+            raise
+        # Bytes inválidos para el encoding pedido: se traduce al contrato
+        # existente para que process_csv reintente completo con latin-1.
+        raise UnicodeDecodeError(encoding, b"", 0, 1, str(exc)) from exc
+
+def _read_csv(input_path: str, sep: str, encoding: str, chunksize: Optional[int] = None):
     """
-    # Cargar con tolerancia
+    Lee el CSV como texto, con tolerancia de encoding. Con chunksize devuelve
+    un iterador de chunks (permite procesar archivos más grandes que la RAM),
+    usando el lector streaming de pyarrow cuando está instalado; sin pyarrow,
+    o para lecturas de archivo entero, usa el parser propio de pandas.
+    """
+    if chunksize is not None:
+        try:
+            import pyarrow  # noqa: F401  (solo detecta disponibilidad)
+        except ImportError:
+            pass
+        else:
+            return _leer_chunks_pyarrow(input_path, sep, encoding, chunksize)
+    opts = dict(sep=sep, dtype=str, keep_default_na=False, chunksize=chunksize)
     try:
-        df = pd.read_csv(input_path, sep=sep, encoding=encoding, dtype=str, keep_default_na=False)
+        return pd.read_csv(input_path, encoding=encoding, **opts)
     except UnicodeDecodeError:
-        df = pd.read_csv(input_path, sep=sep, encoding="latin-1", dtype=str, keep_default_na=False)
+        return pd.read_csv(input_path, encoding="latin-1", **opts)
 
+def _procesar_chunk(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series]:
+    """Limpia un chunk ya cargado. Devuelve (chunk limpio, máscara de cambios)."""
     cols = [c.strip() for c in df.columns]
     df.columns = cols
     if "tipo_via" not in df.columns or "calle" not in df.columns:
@@ -127,37 +257,93 @@ def process_csv(input_path: str, output_path: Optional[str], sep: str, encoding:
     orig_tipo = df["tipo_via"].copy()
     orig_calle = df["calle"].copy()
 
-    # Aplicar limpieza (fila a fila por claridad; sigue siendo rápido)
-    def _apply(row):
-        t, c = limpiar_par(row["tipo_via"], row["calle"])
-        return pd.Series({"tipo_via": t, "calle": c})
-
-    cleaned = df.apply(_apply, axis=1)
-    df["tipo_via"] = cleaned["tipo_via"]
-    df["calle"] = cleaned["calle"]
+    # Limpieza vectorizada: la extracción tipo/nombre se hace en una sola
+    # pasada sobre la columna y la canonización con un mapeo directo, sin
+    # despachar una función Python por fila.
+    calle_limpia = df["calle"].str.strip()
+    cap = calle_limpia.str.extract(TIPO_INICIO_RE)
+    sin_match = cap["tipo"].isna()
+    tipo_nuevo = cap["tipo"].str.lower().map(VARIANT_TO_CANON).fillna(cap["tipo"])
+    # Solo las filas sin tipo extraído pasan por canonizar_tipo; el resto ya
+    # quedó resuelto en la pasada columnar (alineación por índice).
+    tipo_nuevo[sin_match] = _map_unicos(df.loc[sin_match, "tipo_via"], canonizar_tipo)
+    df["tipo_via"] = tipo_nuevo
+    df["calle"] = cap["nombre"].str.strip().fillna(calle_limpia)
 
     changed_mask = (df["tipo_via"] != orig_tipo) | (df["calle"] != orig_calle)
 
+    # Tras la limpieza tipo_via queda en un puñado de etiquetas: como
+    # categoría se guarda un código entero por fila más el diccionario de
+    # etiquetas. astype (y no una lista fija de categorías) para no anular
+    # valores fuera del canon; to_csv escribe la etiqueta, el CSV no cambia.
+    df["tipo_via"] = df["tipo_via"].astype("category")
+    return df, changed_mask
+
+def _procesar_archivo(input_path: str, out: str, sep: str, encoding: str,
+                      preview: int, export: str, chunksize: int, workers: int = 1):
+    """
+    Recorre el CSV por chunks, limpia cada uno y lo escribe incrementalmente.
+    Con workers > 1 la limpieza se reparte entre procesos (cada chunk es
+    independiente; los regex compilados a nivel de módulo se heredan en los
+    workers) y la escritura conserva el orden gracias a imap.
+    Devuelve (filas totales, filas cambiadas, muestras para el preview).
+    """
+    filas = 0
+    cambiadas = 0
+    muestras = []
+    filas_muestra = 0  # filas ya recolectadas para el preview (no chunks)
+    lector = _read_csv(input_path, sep, encoding, chunksize=chunksize)
+    pool = Pool(workers) if workers and workers > 1 else None
+    resultados = pool.imap(_procesar_chunk, lector, chunksize=1) if pool else map(_procesar_chunk, lector)
+    try:
+        with open(out, "w", encoding="utf-8", newline="") as fout:
+            primero = True
+            for chunk, changed_mask in resultados:
+                filas += len(chunk)
+                cambiadas += int(changed_mask.sum())
+                if preview and filas_muestra < preview:
+                    m = chunk.loc[changed_mask, ["tipo_via", "calle"]].head(preview - filas_muestra)
+                    if len(m):
+                        muestras.append(m)
+                        filas_muestra += len(m)
+                df_out = chunk.loc[changed_mask] if export == "changed" else chunk
+                # Guardar siempre con comillas para seguridad
+                df_out.to_csv(fout, index=False, header=primero, sep=sep, quoting=1)  # 1 = csv.QUOTE_ALL
+                primero = False
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return filas, cambiadas, muestras
+
+def process_csv(input_path: str, output_path: Optional[str], sep: str, encoding: str,
+                preview: int, export: str, chunksize: int = CHUNKSIZE, workers: int = 1):
+    """
+    export: 'all' (todas las filas, con cambios aplicados) o 'changed' (solo filas modificadas).
+    """
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    out = output_path or f"{input_path.rsplit('.',1)[0]}_limpio_{ts}.csv"
+
+    # Con lectura por chunks el error de encoding puede aparecer a mitad del
+    # archivo; en ese caso se reintenta el procesamiento completo con latin-1
+    # (misma tolerancia que tenía la lectura de archivo entero).
+    try:
+        filas, cambiadas, muestras = _procesar_archivo(input_path, out, sep, encoding,
+                                                       preview, export, chunksize, workers)
+    except UnicodeDecodeError:
+        filas, cambiadas, muestras = _procesar_archivo(input_path, out, sep, "latin-1",
+                                                       preview, export, chunksize, workers)
+
     # Preview
     if preview and preview > 0:
-        sample = df.loc[changed_mask, ["tipo_via", "calle"]].head(preview)
+        sample = pd.concat(muestras) if muestras else pd.DataFrame(columns=["tipo_via", "calle"])
         print("PREVIEW de filas modificadas:")
         if sample.empty:
             print("(No hay cambios)")
         else:
             print(sample.to_string(index=False))
 
-    # Export
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    out = output_path or f"{input_path.rsplit('.',1)[0]}_limpio_{ts}.csv"
-
-    if export == "changed":
-        df_out = df.loc[changed_mask].copy()
-    else:
-        df_out = df
-
-    # Guardar siempre con comillas para seguridad
-    df_out.to_csv(out, index=False, encoding="utf-8", sep=sep, quoting=1)  # 1 = csv.QUOTE_ALL
+    print(f"Filas procesadas: {filas} | modificadas: {cambiadas}")
     print(f"CSV guardado en: {out}")
 
 def main():
@@ -168,6 +354,10 @@ def main():
     ap.add_argument("--encoding", default="utf-8", help="Encoding de lectura (por defecto 'utf-8')")
     ap.add_argument("--preview", type=int, default=10, help="Muestra N filas modificadas")
     ap.add_argument("--export", choices=["all", "changed"], default="all", help="Qué exportar al CSV")
+    ap.add_argument("--chunksize", type=int, default=CHUNKSIZE,
+                    help=f"Filas por chunk de lectura (por defecto {CHUNKSIZE})")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                    help="Procesos para limpiar chunks en paralelo (por defecto, núcleos disponibles)")
     args = ap.parse_args()
 
     process_csv(
@@ -176,7 +366,9 @@ def main():
         sep=args.sep,
         encoding=args.encoding,
         preview=args.preview,
-        export=args.export
+        export=args.export,
+        chunksize=args.chunksize,
+        workers=args.workers
     )
 
 if __name__ == "__main__":
@@ -6,6 +6,7 @@ import os
 import re
 import sys
 from datetime import datetime
+from functools import lru_cache
 from typing import Optional, Tuple
 
 import psycopg2
@@ -46,30 +47,85 @@ TIPO_INICIO_RE = re.compile(
     re.IGNORECASE | re.VERBOSE
 )
 
+# Variante sin IGNORECASE para el camino escalar (el patrón ya está escrito en
+# minúsculas): la entrada se baja a minúsculas una sola vez y el motor se
+# ahorra el case-folding por carácter en cada transición.
+TIPO_INICIO_LC_RE = re.compile(TIPO_INICIO_RE.pattern, re.VERBOSE)
+
 # 2) Reglas de CANONIZACIÓN usando SOLO regex (sin diccionarios lógicos).
-#    Se toman decisiones de reemplazo con patrones -> canónico.
-CANON_RULES = [
-    (re.compile(r'^(?:av(?:\.|enida)?)$', re.IGNORECASE), "Avenida"),
-    (re.compile(r'^(?:cal(?:le|\.?)|c\.)$', re.IGNORECASE), "Calle"),
-    (re.compile(r'^(?:bule?var|boulevard|blvd\.?)$', re.IGNORECASE), "Bulevar"),
-    (re.compile(r'^(?:cto\.?|circuito)$', re.IGNORECASE), "Circuito"),
-    (re.compile(r'^(?:cam(?:ino|\.?))$', re.IGNORECASE), "Camino"),
-    (re.compile(r'^(?:calz(?:ada|\.?))$', re.IGNORECASE), "Calzada"),
-    (re.compile(r'^(?:prol(?:\.|ongaci[oó]n)?)$', re.IGNORECASE), "Prolongación"),
-    (re.compile(r'^(?:priv(?:ada|\.?))$', re.IGNORECASE), "Privada"),
-    (re.compile(r'^(?:cerr(?:ada|\.?))$', re.IGNORECASE), "Cerrada"),
-    (re.compile(r'^(?:c(?:jon|allej[oó]n)\.?)$', re.IGNORECASE), "Callejón"),
-    (re.compile(r'^(?:and(?:ador|\.?))$', re.IGNORECASE), "Andador"),
-    (re.compile(r'^(?:carretera|carr\.?|cte\.?)$', re.IGNORECASE), "Carretera"),
-    (re.compile(r'^(?:eje)$', re.IGNORECASE), "Eje"),
-    (re.compile(r'^(?:paseo|psje\.?|pseo)$', re.IGNORECASE), "Paseo"),
-    (re.compile(r'^(?:anillo)$', re.IGNORECASE), "Anillo"),
-    (re.compile(r'^(?:v[ií]a)$', re.IGNORECASE), "Vía"),
-    (re.compile(r'^(?:perif(?:[eé]rico|\.?))$', re.IGNORECASE), "Periférico"),
-    (re.compile(r'^(?:viad(?:ucto|\.?))$', re.IGNORECASE), "Viaducto"),
-    (re.compile(r'^(?:aldea)$', re.IGNORECASE), "Aldea"),
+#    Una sola alternación con grupos nombrados: un único match identifica la
+#    clase canónica vía m.lastgroup, en vez de probar ~20 regex por llamada.
+CANON_GROUPS = [
+    # (nombre de grupo ASCII, forma canónica, patrón de variantes)
+    ("Avenida",      "Avenida",      r"av(?:\.|enida)?"),
+    ("Calle",        "Calle",        r"cal(?:le|\.?)|c\."),
+    ("Bulevar",      "Bulevar",      r"bule?var|boulevard|blvd\.?"),
+    ("Circuito",     "Circuito",     r"cto\.?|circuito"),
+    ("Camino",       "Camino",       r"cam(?:ino|\.?)"),
+    ("Calzada",      "Calzada",      r"calz(?:ada|\.?)"),
+    ("Prolongacion", "Prolongación", r"prol(?:\.|ongaci[oó]n)?"),
+    ("Privada",      "Privada",      r"priv(?:ada|\.?)"),
+    ("Cerrada",      "Cerrada",      r"cerr(?:ada|\.?)"),
+    ("Callejon",     "Callejón",     r"c(?:jon|allej[oó]n)\.?"),
+    ("Andador",      "Andador",      r"and(?:ador|\.?)"),
+    ("Carretera",    "Carretera",    r"carretera|carr\.?|cte\.?"),
+    ("Eje",          "Eje",          r"eje"),
+    ("Paseo",        "Paseo",        r"paseo|psje\.?|pseo"),
+    ("Anillo",       "Anillo",       r"anillo"),
+    ("Via",          "Vía",          r"v[ií]a"),
+    ("Periferico",   "Periférico",   r"perif(?:[eé]rico|\.?)"),
+    ("Viaducto",     "Viaducto",     r"viad(?:ucto|\.?)"),
+    ("Aldea",        "Aldea",        r"aldea"),
 ]
+GROUP_TO_CANON = {grupo: canon for grupo, canon, _ in CANON_GROUPS}
+CANON_RE = re.compile(
+    "|".join(f"(?P<{grupo}>(?:{patron}))" for grupo, _, patron in CANON_GROUPS),
+    re.IGNORECASE
+)
 
+# Mapeo directo variante (en minúsculas) → forma canónica (espejo de 1paso.py).
+# Permite resolver el caso común — primer token de "calle" es una variante
+# exacta — con un solo lookup de diccionario en vez de ejecutar el regex.
+VARIANT_TO_CANON = {
+    "av": "Avenida", "av.": "Avenida", "avenida": "Avenida",
+    "calle": "Calle", "cal": "Calle", "cal.": "Calle", "c.": "Calle",
+    "bulevar": "Bulevar", "bulvar": "Bulevar", "boulevard": "Bulevar", "blvd": "Bulevar", "blvd.": "Bulevar",
+    "cto": "Circuito", "cto.": "Circuito", "circuito": "Circuito",
+    "camino": "Camino", "cam": "Camino", "cam.": "Camino",
+    "calzada": "Calzada", "calz": "Calzada", "calz.": "Calzada",
+    "prol": "Prolongación", "prol.": "Prolongación", "prolongacion": "Prolongación", "prolongación": "Prolongación",
+    "privada": "Privada", "priv": "Privada", "priv.": "Privada",
+    "cerrada": "Cerrada", "cerr": "Cerrada", "cerr.": "Cerrada",
+    "cjon": "Callejón", "cjon.": "Callejón",
+    "callejon": "Callejón", "callejon.": "Callejón", "callejón": "Callejón", "callejón.": "Callejón",
+    "andador": "Andador", "and": "Andador", "and.": "Andador",
+    "carretera": "Carretera", "carr": "Carretera", "carr.": "Carretera", "cte": "Carretera", "cte.": "Carretera",
+    "eje": "Eje",
+    "paseo": "Paseo", "psje": "Paseo", "psje.": "Paseo", "pseo": "Paseo",
+    "anillo": "Anillo",
+    "via": "Vía", "vía": "Vía",
+    "periferico": "Periférico", "periférico": "Periférico", "perif": "Periférico", "perif.": "Periférico",
+    "viaducto": "Viaducto", "viad": "Viaducto", "viad.": "Viaducto",
+    "aldea": "Aldea",
+}
+
+# Internar las formas canónicas: se repiten en millones de filas y, una vez
+# internadas, las comparaciones de igualdad resuelven por identidad de puntero.
+for _d in (VARIANT_TO_CANON, GROUP_TO_CANON):
+    for _k in _d:
+        _d[_k] = sys.intern(_d[_k])
+
+# Aliases a nivel de módulo para el camino caliente: evitan re-resolver el
+# atributo (LOAD_ATTR del método) en cada llamada de limpiar_par.
+_TIPO_MATCH = TIPO_INICIO_RE.match
+_TIPO_MATCH_LC = TIPO_INICIO_LC_RE.match
+_BUSCAR_VARIANTE = VARIANT_TO_CANON.get
+
+# Tupla de variantes para el filtro negativo con str.startswith: rechaza en C
+# la gran mayoría de calles que no inician con tipo de vía, sin tocar el regex.
+VARIANT_PREFIXES = tuple(VARIANT_TO_CANON)
+
+@lru_cache(maxsize=200_000)
 def canonizar_tipo(tipo: Optional[str]) -> Optional[str]:
     if not isinstance(tipo, str) or not tipo.strip():
         return tipo
@@ -79,9 +135,9 @@ def canonizar_tipo(tipo: Optional[str]) -> Optional[str]:
     if m:
         t = m.group("tipo")
 
-    for rx, canon in CANON_RULES:
-        if rx.match(t):
-            return canon
+    m = CANON_RE.fullmatch(t)
+    if m:
+        return GROUP_TO_CANON[m.lastgroup]
     # Si no coincide con ninguna regla, devuelve tal cual (pero limpio de espacios)
     return t
 
@@ -93,27 +149,52 @@ def limpiar_par(tipo_via: Optional[str], calle: Optional[str]) -> Tuple[Optional
     - Si no, se intenta canonizar únicamente 'tipo_via' con reglas regex.
     - Caso sucio: tipo_via == calle (mismo texto), reintenta separar desde 'calle'.
     """
+    # Normalizar una sola vez: cada .strip()/.lower() repetido aloca un str
+    # nuevo y esta función corre millones de veces.
+    c = calle.strip() if isinstance(calle, str) else calle
+    c_lc = None
+
     # 1) Intentar extraer desde el inicio de "calle"
-    if isinstance(calle, str):
-        m = TIPO_INICIO_RE.match(calle.strip())
-        if m:
-            tipo_raw = m.group("tipo")
-            nombre = m.group("nombre").strip()
-            tipo_canon = canonizar_tipo(tipo_raw)
-            return tipo_canon, nombre
+    if isinstance(c, str):
+        # Una sola bajada a minúsculas para todo el análisis del valor.
+        c_lc = c.lower()
+        # Camino rápido: si el primer token es una variante conocida, el par
+        # se resuelve con un lookup de diccionario sin invocar el regex.
+        i = c_lc.find(" ")
+        if i > 0:
+            canon = _BUSCAR_VARIANTE(c_lc[:i])
+            if canon:
+                resto = c[i + 1:].strip()
+                if resto:
+                    return canon, resto
+        # Filtro negativo barato: si la calle ni siquiera empieza con alguna
+        # variante, no hay match posible y no vale la pena invocar el regex
+        # (el caso dominante en datos reales).
+        if c_lc.startswith(VARIANT_PREFIXES):
+            # El regex sin IGNORECASE corre sobre c_lc y los spans indexan el
+            # original c (lower() conserva longitudes salvo Unicode exótico).
+            m = _TIPO_MATCH_LC(c_lc) if len(c_lc) == len(c) else _TIPO_MATCH(c)
+            if m:
+                tipo_canon = canonizar_tipo(m.group("tipo"))
+                nombre = c[m.start("nombre"):m.end("nombre")].strip()
+                return tipo_canon, nombre
 
     # 2) Canonizar tipo_via por regex
     tipo_canon = canonizar_tipo(tipo_via)
 
     # 3) Si tipo_via y calle son exactamente iguales tras strip, reintenta extracción
-    if isinstance(tipo_via, str) and isinstance(calle, str):
-        if tipo_via.strip().lower() == calle.strip().lower():
-            m2 = TIPO_INICIO_RE.match(calle.strip())
+    if isinstance(tipo_via, str) and c_lc is not None:
+        if tipo_via.strip().lower() == c_lc:
+            m2 = _TIPO_MATCH(c)
             if m2:
                 return canonizar_tipo(m2.group("tipo")), m2.group("nombre").strip()
 
     # 4) Sin cambios estructurales
-    return tipo_canon, (calle.strip() if isinstance(calle, str) else calle)
+    return tipo_canon, c
+
+# Versión memoizada para los bucles sobre cursores: los pares (tipo_via, calle)
+# se repiten muchísimo en tablas reales, y el cache evita repetir las regex.
+_limpiar_par_cached = lru_cache(maxsize=200_000)(limpiar_par)
 
 # =========================
 # DB helpers
@@ -127,13 +208,44 @@ def ensure_backup(cur, schema: str, table: str) -> str:
     cur.execute(f'CREATE TABLE {qualify(schema, bkp)} AS TABLE {qualify(schema, table)};')
     return bkp
 
+def build_server_update_sql(schema: str, table: str, pk: str, where_sql: Optional[str]) -> str:
+    """
+    Genera un UPDATE que resuelve el caso dominante (calle inicia con una
+    variante reconocida) directamente en PostgreSQL: separa el nombre con
+    regexp_replace y canoniza el tipo con un CASE, en un solo barrido de la
+    tabla y sin mover filas a Python. Los patrones salen de CANON_GROUPS, así
+    que SQL y Python comparten las mismas reglas. Devuelve los {pk} afectados
+    vía RETURNING; el resto de los casos (solo tipo_via sucio, espacios raros)
+    los sigue cubriendo el barrido en Python.
+    """
+    head = "|".join(patron for _, _, patron in CANON_GROUPS)
+    casos = "\n".join(
+        rf"        WHEN calle ~* '^\s*(?:{patron})\s+\S' THEN '{canon}'"
+        for _, canon, patron in CANON_GROUPS
+    )
+    sql = (
+        f"UPDATE {qualify(schema, table)} SET\n"
+        f"    tipo_via = CASE\n{casos}\n        ELSE tipo_via END,\n"
+        rf"    calle = btrim(regexp_replace(calle, '^\s*(?:{head})\s+', '', 'i'))" + "\n"
+        rf"WHERE calle ~* '^\s*(?:{head})\s+\S'"
+    )
+    if where_sql:
+        sql += f" AND ({where_sql})"
+    sql += f" RETURNING {pk}"
+    return sql
+
 def process(conn, schema: str, table: str, pk: str, where_sql: Optional[str],
             dry_run: bool, preview: int, batch_commit: int) -> int:
     """
     Actualiza filas que cambien (tipo_via/calle) usando solo regex.
     Devuelve el número de registros modificados.
     """
-    update_sql = f'UPDATE {qualify(schema, table)} SET tipo_via = %s, calle = %s WHERE {pk} = %s'
+    # UPDATE por lotes con VALUES: un solo round-trip por lote en lugar de
+    # un execute (red + parse + plan) por fila.
+    update_sql = (
+        f'UPDATE {qualify(schema, table)} AS t SET tipo_via = v.tipo_via, calle = v.calle '
+        f'FROM (VALUES %s) AS v(id, tipo_via, calle) WHERE t.{pk} = v.id'
+    )
 
     # Cursor server-side para iterar sin cargar todo a memoria
     name = f"csr_{table}_{datetime.now().strftime('%H%M%S')}"
@@ -147,7 +259,7 @@ def process(conn, schema: str, table: str, pk: str, where_sql: Optional[str],
 
     cur = conn.cursor()
     updated = 0
-    to_commit = 0
+    pendientes = []
     shown = 0
 
     for row in csr:
@@ -155,7 +267,7 @@ def process(conn, schema: str, table: str, pk: str, where_sql: Optional[str],
         tipo_via = row["tipo_via"]
         calle = row["calle"]
 
-        nuevo_tipo, nueva_calle = limpiar_par(tipo_via, calle)
+        nuevo_tipo, nueva_calle = _limpiar_par_cached(tipo_via, calle)
 
         # Saltar si no cambió nada
         if (nuevo_tipo == tipo_via) and (nueva_calle == calle):
@@ -166,15 +278,16 @@ def process(conn, schema: str, table: str, pk: str, where_sql: Optional[str],
             shown += 1
 
         if not dry_run:
-            cur.execute(update_sql, (nuevo_tipo, nueva_calle, rid))
-            to_commit += 1
-            if to_commit >= batch_commit:
+            pendientes.append((rid, nuevo_tipo, nueva_calle))
+            if len(pendientes) >= batch_commit:
+                psycopg2.extras.execute_values(cur, update_sql, pendientes, page_size=1000)
                 conn.commit()
-                to_commit = 0
+                pendientes.clear()
 
         updated += 1
 
-    if not dry_run and to_commit > 0:
+    if not dry_run and pendientes:
+        psycopg2.extras.execute_values(cur, update_sql, pendientes, page_size=1000)
         conn.commit()
 
     return updated
@@ -199,7 +312,6 @@ def export_csv(conn, schema: str, table: str, where_sql: Optional[str], export_m
 
     # Construir query de export
     base = f'SELECT {", ".join(cols)} FROM {qualify(schema, table)}'
-    params = []
     if export_mode == "changed":
         if not changed_ids:
             print("No hubo cambios; exportación 'changed' resultará vacía.")
@@ -207,9 +319,20 @@ def export_csv(conn, schema: str, table: str, where_sql: Optional[str], export_m
             header = cols
             _write_csv(out_path, header, rows)
             return
-        placeholders = ",".join(["%s"] * len(changed_ids))
-        base += f' WHERE {cols[0]} IN ({placeholders})'  # asumiendo cols[0] incluye el PK; si no, reemplaza por el nombre del PK
-        params.extend(list(changed_ids))
+        # Volcar los IDs cambiados a una tabla temporal y filtrar con un
+        # semi-join server-side: evita armar un IN (...) con N placeholders,
+        # que infla el plan y el parseo de la consulta. Todas las referencias
+        # van calificadas con pg_temp: un DROP sin calificar resolvería por
+        # search_path y podría tumbar una tabla permanente homónima.
+        with conn.cursor() as cur:
+            cur.execute('DROP TABLE IF EXISTS pg_temp.tmp_ids_export')
+            # asumiendo cols[0] incluye el PK; si no, reemplaza por el nombre del PK
+            cur.execute(f'CREATE TEMP TABLE tmp_ids_export AS SELECT {cols[0]} AS id FROM {qualify(schema, table)} LIMIT 0')
+            psycopg2.extras.execute_values(
+                cur, 'INSERT INTO pg_temp.tmp_ids_export (id) VALUES %s',
+                [(i,) for i in changed_ids], page_size=10_000
+            )
+        base += f' WHERE {cols[0]} IN (SELECT id FROM pg_temp.tmp_ids_export)'
         if where_sql:
             base += f' AND {where_sql}'
     else:
@@ -220,15 +343,19 @@ def export_csv(conn, schema: str, table: str, where_sql: Optional[str], export_m
     if limit and limit > 0:
         base += f' LIMIT {limit}'
 
-    with conn.cursor(name=f"exp_{table}_{datetime.now().strftime('%H%M%S')}") as csr:
-        csr.itersize = 5000
-        csr.execute(base, params)
-        header = cols
-        _write_csv(out_path, header, csr)
+    # COPY genera el CSV con el encoder nativo de Postgres y lo transmite
+    # directo al archivo: sin marshaling fila por fila en Python.
+    # FORCE QUOTE * conserva el comillado total que usaba csv.QUOTE_ALL.
+    # Buffer de 1 MiB: el COPY llega en trozos chicos y así se agrupan en
+    # pocas llamadas write() al disco.
+    out = out_path or f"export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    with open(out, "wb", buffering=1 << 20) as f, conn.cursor() as cur:
+        cur.copy_expert(f'COPY ({base}) TO STDOUT WITH CSV HEADER FORCE QUOTE *', f)
+    print(f"CSV exportado: {os.path.abspath(out)}")
 
 def _write_csv(out_path: str, header, rows_iter):
     out = out_path or f"export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-    with open(out, "w", newline="", encoding="utf-8") as f:
+    with open(out, "w", newline="", encoding="utf-8", buffering=1 << 20) as f:
         w = csv.writer(f, quoting=csv.QUOTE_ALL)
         w.writerow(header)
         # rows_iter puede ser lista o cursor server-side
@@ -260,6 +387,8 @@ def main():
     # Operación
     ap.add_argument("--where", default=None, help="Cláusula WHERE para acotar (sin 'WHERE')")
     ap.add_argument("--dry-run", action="store_true", help="Simula (no escribe)")
+    ap.add_argument("--server-side", action="store_true",
+                    help="Resuelve el caso dominante con un solo UPDATE en PostgreSQL antes del barrido en Python")
     ap.add_argument("--backup", action="store_true", help="Crea una copia de la tabla antes de modificar")
     ap.add_argument("--preview", type=int, default=10, help="Muestra N cambios en consola")
     ap.add_argument("--batch-commit", type=int, default=5000, help="Tamaño de lote para COMMIT")
@@ -287,6 +416,24 @@ def main():
 
             # Procesar y actualizar
             changed_ids = set()
+
+            # Pase server-side opcional: un solo UPDATE hace la separación y
+            # canonización del caso dominante sin round-trips por fila; el
+            # barrido en Python de abajo solo recoge lo que quede. Las filas
+            # ya resueltas aquí se excluyen del barrido: re-limpiarlas
+            # recortaría dos veces una calle cuyo nombre empieza con otro
+            # tipo de vía ("Av. Paseo de la Reforma" → "Paseo"/"de la Reforma").
+            ids_servidor = set()
+            if args.server_side:
+                if args.dry_run:
+                    print("Dry-run: se omite el pase server-side (modificaría la tabla).")
+                else:
+                    with conn.cursor() as cur:
+                        cur.execute(build_server_update_sql(args.schema, args.table, args.pk, args.where))
+                        ids_servidor = {r[0] for r in cur.fetchall()}
+                    conn.commit()
+                    changed_ids.update(ids_servidor)
+                    print(f"Pase server-side: {len(ids_servidor)} filas separadas/canonizadas en SQL")
             # Para recolectar IDs cambiados: re-ejecutamos el bucle con un cursor de lectura, aplicamos, y si cambia, guardamos id.
             # Reutilizamos la misma lógica de process pero capturando ids:
             name = f"scan_{args.table}_{datetime.now().strftime('%H%M%S')}"
@@ -299,16 +446,21 @@ def main():
             scan.execute(base)
 
             upd_cur = conn.cursor()
-            upd_sql = f'UPDATE {qualify(args.schema, args.table)} SET tipo_via = %s, calle = %s WHERE {args.pk} = %s'
+            upd_sql = (
+                f'UPDATE {qualify(args.schema, args.table)} AS t SET tipo_via = v.tipo_via, calle = v.calle '
+                f'FROM (VALUES %s) AS v(id, tipo_via, calle) WHERE t.{args.pk} = v.id'
+            )
             shown = 0
-            to_commit = 0
+            pendientes = []
             updated = 0
 
             for row in scan:
                 rid = row[args.pk]
+                if rid in ids_servidor:
+                    continue
                 tipo_via = row["tipo_via"]
                 calle = row["calle"]
-                nt, nc = limpiar_par(tipo_via, calle)
+                nt, nc = _limpiar_par_cached(tipo_via, calle)
 
                 if (nt == tipo_via) and (nc == calle):
                     continue
@@ -320,14 +472,15 @@ def main():
                 changed_ids.add(rid)
 
                 if not args.dry_run:
-                    upd_cur.execute(upd_sql, (nt, nc, rid))
-                    to_commit += 1
-                    if to_commit >= args.batch_commit:
+                    pendientes.append((rid, nt, nc))
+                    if len(pendientes) >= args.batch_commit:
+                        psycopg2.extras.execute_values(upd_cur, upd_sql, pendientes, page_size=1000)
                         conn.commit()
-                        to_commit = 0
+                        pendientes.clear()
                 updated += 1
 
-            if not args.dry_run and to_commit > 0:
+            if not args.dry_run and pendientes:
+                psycopg2.extras.execute_values(upd_cur, upd_sql, pendientes, page_size=1000)
                 conn.commit()
 
             print(f"Registros modificados: {updated} {'(simulado)' if args.dry_run else ''}")
@@ -1,10 +1,12 @@
+import random
+from typing import List, Optional, Set
+
+
 def enforce_min_integers_inplace(values: List[str],
                                  min_needed: int,
                                  lo: int = 1,
                                  hi: int = 9999,
                                  forbidden_values: Optional[Set[str]] = None) -> None:
-    forbidden_values = forbidden_values or set()
-
     # --- Normalización robusta a str ---
     norm_values: List[str] = []
     for v in values:
@@ -24,8 +26,15 @@ def enforce_min_integers_inplace(values: List[str],
     if faltan == 0:
         return
 
-    candidatos = [i for i, v in enumerate(values)
-                  if (not v.isdigit()) and (v not in (forbidden_values or set()))]
+    # Rama especializada: sin prohibidos no se evalúa membresía alguna; con
+    # prohibidos, un frozenset local asegura hashing O(1) aunque llegue una
+    # lista, y evita el `or set()` que creaba un set vacío por elemento.
+    if not forbidden_values:
+        candidatos = [i for i, v in enumerate(values) if not v.isdigit()]
+    else:
+        forb = frozenset(forbidden_values)
+        candidatos = [i for i, v in enumerate(values)
+                      if (not v.isdigit()) and (v not in forb)]
     random.shuffle(candidatos)
 
     if len(candidatos) < faltan:
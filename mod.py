@@ -1,15 +1,24 @@
+import concurrent.futures
 import csv
+import functools
+import itertools
 import math
-import random
+import os
 import re
 import string
+import zlib
+from dataclasses import dataclass
 from pathlib import Path
 from typing import List, Dict, Tuple, Optional, Set
 from datetime import datetime
 
+import numpy as np
+
 TARGET_ROWS = 2000
 SEED = 42
-random.seed(SEED)
+# Única fuente de aleatoriedad del módulo: el Generator de NumPy (PCG64)
+# produce lotes completos en una llamada C, a diferencia del módulo random.
+rng = np.random.default_rng(SEED)
 
 SCRIPT_DIR = Path(__file__).resolve().parent   # carpeta 'modismos'
 PROJECT_ROOT = SCRIPT_DIR.parent
@@ -42,188 +51,345 @@ COMBOS_LETRA_NUM_POR_COLUMNA = 600
 RANGO_ENTEROS = (1, 9999)
 PRIORITARIOS_N_VECES = 100  
 
+# Espacios y comillas de los extremos en una sola sustitución por línea.
+_RE_BORDES = re.compile(r'^[\s"\']+|[\s"\']+$')
+
+@functools.lru_cache(maxsize=None)
 def read_txt_lines(file_path: Path) -> List[str]:
     if not file_path.exists():
         return []
+    data = file_path.read_bytes()
     try:
-        content = file_path.read_text(encoding="utf-8", errors="ignore")
-    except Exception:
-        content = file_path.read_text(encoding="latin-1", errors="ignore")
-    return [line.strip().strip('"').strip("'") for line in content.splitlines() if line.strip()]
+        text = data.decode("utf-8")
+    except UnicodeDecodeError:
+        text = data.decode("latin-1", errors="ignore")
+    return [_RE_BORDES.sub("", line) for line in text.splitlines() if line.strip()]
 
 def discover_subfolders(base_dir: Path) -> List[Path]:
     subs = [p for p in base_dir.iterdir() if p.is_dir() and not p.name.startswith(".")]
     return sorted([d for d in subs if any(d.glob("*.txt"))], key=lambda p: p.name.lower())
 
-def read_subfolder_map(folder_path: Path) -> Dict[str, List[str]]:
-    return {txt.name: read_txt_lines(txt) for txt in sorted(folder_path.glob("*.txt"), key=lambda p: p.name.lower())}
+@dataclass(slots=True)
+class FolderData:
+    """Contenido de una subcarpeta ya separado por rol, en una sola pasada."""
+    prioritarios: List[str]
+    others: Dict[str, List[str]]  # todos los .txt salvo prioritarios.txt
+    sin_numero: List[str]
+
+def read_folder_data(folder_path: Path) -> FolderData:
+    # Se mantiene el orden por nombre: el apareado valor↔número río abajo
+    # depende del orden de lectura y debe ser reproducible entre sistemas.
+    data = FolderData([], {}, [])
+    for txt in sorted(folder_path.glob("*.txt"), key=lambda p: p.name.lower()):
+        vals = read_txt_lines(txt)
+        if txt.name == "prioritarios.txt":
+            data.prioritarios = vals
+        else:
+            data.others[txt.name] = vals
+            if txt.name == "sin_numero.txt":
+                data.sin_numero = vals
+    return data
+
+# Regex precompilados para los helpers numéricos: se llaman miles de veces
+# por columna y así se evita el lookup en el caché de re por llamada.
+_RE_NO_NUM = re.compile(r"[^\d,\.]")
+_RE_NO_DIGITO = re.compile(r"[^\d]")
+# Parte entera y fracción en un solo match: el grupo codicioso llega hasta el
+# último separador, que es el que la versión anterior tomaba como decimal.
+_RE_ENTERO_FRAC = re.compile(r"^(.*)[.,](\d*)$")
 
 def _parse_and_round_number(num_str: str, fallback_min: int = 1, fallback_max: int = 9999) -> int:
-    s = re.sub(r"[^\d,\.]", "", num_str)
+    s = _RE_NO_NUM.sub("", num_str)
     if not s:
-        return random.randint(fallback_min, fallback_max)
-    if "," not in s and "." not in s:
-        return int(s) if s.isdigit() else random.randint(fallback_min, fallback_max)
-    last_sep = max(s.rfind(","), s.rfind("."))
+        return int(rng.integers(fallback_min, fallback_max + 1))
+    if s.isdigit():
+        return int(s)
+    m = _RE_ENTERO_FRAC.match(s)
+    if not m:
+        return int(rng.integers(fallback_min, fallback_max + 1))
+    entero_str, frac_str = m.groups()
     try:
-        entero = int(re.sub(r"[^\d]", "", s[:last_sep]) or 0)
-        frac = int(re.sub(r"[^\d]", "", s[last_sep+1:]) or 0) / (10 ** len(s[last_sep+1:]))
+        entero = int(_RE_NO_DIGITO.sub("", entero_str) or 0)
+        frac = int(frac_str or 0) / (10 ** len(frac_str))
         return int(round(entero + frac))
     except Exception:
-        return random.randint(fallback_min, fallback_max)
+        return int(rng.integers(fallback_min, fallback_max + 1))
 
 def _round_to_str(num_str: str, lo: int = 1, hi: int = 9999) -> str:
     return str(max(lo, min(hi, _parse_and_round_number(num_str, lo, hi))))
 
+def _es_tramo_num(s: str) -> bool:
+    # Equivalente a \d[\d.,]* del patrón original.
+    return s[:1].isdecimal() and all(c.isdecimal() or c == "." or c == "," for c in s)
+
+def _es_tramo_letras(s: str) -> bool:
+    # Equivalente a [A-Za-z]+ (isalpha solo no basta: acepta acentuadas).
+    return bool(s) and s.isascii() and s.isalpha()
+
 def sanitizar_combos_letra_num(val: str, lo: int = 1, hi: int = 9999) -> str:
-    patrones = [
-        r"^(\d[\d.,]*)-([A-Za-z]+)$",
-        r"^([A-Za-z]+)-(\d[\d.,]*)$",
-        r"^(\d[\d.,]*)([A-Za-z]+)$",
-        r"^([A-Za-z]+)(\d[\d.,]*)$",
-    ]
-    for pat in patrones:
-        m = re.match(pat, val)
-        if m:
-            return f"{m.group(1)}{m.group(2)}" if pat.startswith("^([A-Za-z]+)") else f"{m.group(1)}{m.group(2)}"
+    # Clasificación con los predicados C de str en lugar del motor de regex:
+    # solo las formas número-guion-letras (o al revés) cambian, quitando el
+    # guion; cualquier otra cosa se devuelve intacta.
+    izq, sep, der = val.partition("-")
+    if sep and izq and der:
+        if (_es_tramo_num(izq) and _es_tramo_letras(der)) or \
+           (_es_tramo_letras(izq) and _es_tramo_num(der)):
+            return izq + der
     return val
 
-def force_append_number(values: List[str], min_num: int = 1, max_num: int = 9999, sep: str = " ") -> List[str]:
-    return [f"{v}{sep}{random.randint(min_num, max_num)}" for v in values if v.strip()]
+def force_append_number(values: List[str], min_num: int = 1, max_num: int = 9999, sep: str = " ",
+                        out: Optional[List[str]] = None) -> List[str]:
+    # Un solo sorteo en lote con rng.integers y concatenación simple, en
+    # vez de un randint + f-string por elemento. Con `out`, los valores se
+    # vuelcan por generador a la lista destino sin lista intermedia.
+    vs = [v for v in values if v.strip()]
+    nums = rng.integers(min_num, max_num + 1, size=len(vs)).tolist()
+    filas = (v + sep + str(n) for v, n in zip(vs, nums))
+    if out is None:
+        return list(filas)
+    out.extend(filas)
+    return out
 
 def build_combinations_from_txt(patterns: List[Tuple[List[str], int]],
                                 base_dir: Path,
                                 n_samples: int,
-                                num_ranges: List[Tuple[int, int]]) -> List[str]:
-    results: List[str] = []
-    for _ in range(n_samples):
-        file_list, n_nums = random.choice(patterns)
-        parts: List[str] = []
+                                num_ranges: List[Tuple[int, int]],
+                                out: Optional[List[str]] = None) -> List[str]:
+    # Todas las decisiones aleatorias en lotes: primero se elige el patrón de
+    # cada muestra, luego por patrón se sortean de una vez las variantes y los
+    # números de cada posición con rng.integers (C-level), y al final se
+    # rearma el resultado en el orden original de los sorteos de patrón.
+    pat_idx = rng.integers(0, len(patterns), size=n_samples).tolist()
+    counts = [0] * len(patterns)
+    for p in pat_idx:
+        counts[p] += 1
+
+    armados: List[List[str]] = []
+    for p, (file_list, n_nums) in enumerate(patterns):
+        cnt = counts[p]
+        columnas: List[List[str]] = []
         for idx, txt_name in enumerate(file_list):
             variants = read_txt_lines(base_dir / txt_name)
             if not variants:
                 continue
-            parts.append(random.choice(variants))
+            columnas.append([variants[i] for i in rng.integers(0, len(variants), size=cnt)])
             if idx < n_nums:
                 lo, hi = num_ranges[min(idx, len(num_ranges) - 1)]
-                parts.append(str(random.randint(lo, hi)))
-        if parts:
-            results.append(" ".join(parts))
+                columnas.append([str(x) for x in rng.integers(lo, hi + 1, size=cnt).tolist()])
+        armados.append([" ".join(fila) for fila in zip(*columnas)] if columnas else [])
+
+    iteradores = [iter(a) for a in armados]
+    results: List[str] = [] if out is None else out
+    for p in pat_idx:
+        s = next(iteradores[p], None)
+        if s is not None:
+            results.append(s)
     return results
 
-def generate_letter_number_combos(letras: List[str], n: int, lo: int = 1, hi: int = 9999) -> List[str]:
+def generate_letter_number_combos(letras: List[str], n: int, lo: int = 1, hi: int = 9999,
+                                  out: Optional[List[str]] = None) -> List[str]:
     patrones = ("L-N", "N-L", "LN", "NL")
-    return [
-        sanitizar_combos_letra_num(
-            f"{letra}-{num}" if p == "L-N" else
-            f"{num}-{letra}" if p == "N-L" else
-            f"{letra}{num}" if p == "LN" else
-            f"{num}{letra}",
-            lo, hi
-        )
-        for letra, num, p in [(random.choice(letras), random.randint(lo, hi), random.choice(patrones)) for _ in range(n)]
-    ]
+    # Tres streams en lote: 3 llamadas al RNG en vez de 3n. Se sortean
+    # índices con rng.integers (nunca la lista directa a rng.choice, que la
+    # convertiría a ndarray en cada llamada).
+    letters = [letras[i] for i in rng.integers(0, len(letras), size=n)]
+    nums = rng.integers(lo, hi + 1, size=n).tolist()
+    pats = [patrones[i] for i in rng.integers(0, len(patrones), size=n)]
+    # sanitizar_combos_letra_num eliminaba el guion de "L-N"/"N-L", de modo
+    # que las cuatro formas colapsan en letra+número o número+letra; se
+    # generan ya saneadas y se ahorra un regex por elemento.
+    combos = (
+        f"{letra}{num}" if p in ("L-N", "LN") else f"{num}{letra}"
+        for letra, num, p in zip(letters, nums, pats)
+    )
+    if out is None:
+        return list(combos)
+    out.extend(combos)
+    return out
+
+def _muestra_por_insercion(values: List[str], k: int) -> List[str]:
+    # Muestreo por inserción con rechazo de duplicados: para k pequeño frente
+    # a n evita la permutación parcial O(n) que hace random.sample por dentro.
+    n = len(values)
+    vistos: Set[int] = set()
+    out: List[str] = []
+    integers = rng.integers
+    while len(out) < k:
+        i = int(integers(0, n))
+        if i not in vistos:
+            vistos.add(i)
+            out.append(values[i])
+    return out
 
 def pad_or_trim(values: List[str], target_len: int) -> List[str]:
     if not values:
         return [""] * target_len
-    out = values.copy()
-    while len(out) < target_len:
-        out.append(random.choice(values))
-    return random.sample(out, target_len) if len(out) > target_len else out
+    if len(values) < target_len:
+        # Relleno en un solo lote (C-level) en vez de un choice por faltante.
+        return values + [values[i] for i in rng.integers(0, len(values), size=target_len - len(values))]
+    if target_len < len(values) // 2:
+        return _muestra_por_insercion(values, target_len)
+    if len(values) > target_len:
+        return [values[i] for i in rng.choice(len(values), size=target_len, replace=False)]
+    return values.copy()
 
 def enforce_min_integers_inplace(values: List[str],
                                  min_needed: int,
                                  lo: int = 1,
                                  hi: int = 9999,
                                  forbidden_values: Optional[Set[str]] = None) -> None:
-    forbidden_values = forbidden_values or set()
-    idx_enteros = [i for i, v in enumerate(values) if v.isdigit()]
-    faltan = max(0, min_needed - len(idx_enteros))
-    if faltan == 0:
+    # Una sola pasada de isdigit y el resto en NumPy: conteo, filtrado de
+    # candidatos, muestreo sin reemplazo y enteros de relleno en lote.
+    es_entero = np.fromiter((v.isdigit() for v in values), dtype=bool, count=len(values))
+    faltan = min_needed - int(es_entero.sum())
+    if faltan <= 0:
         return
-    candidatos = [i for i, v in enumerate(values) if not v.isdigit() and v not in forbidden_values]
-    random.shuffle(candidatos)
-    for i in candidatos[:faltan]:
-        values[i] = str(random.randint(lo, hi))
-
-def build_table(columns: Dict[str, List[str]], ordered_names: List[str]) -> List[Dict[str, str]]:
-    return [
-        {col: columns.get(col, [""])[i] if i < len(columns.get(col, [])) else "" for col in ordered_names}
-        for i in range(max(len(v) for v in columns.values()))
-    ]
-
-def save_csv(rows: List[Dict[str, str]], column_names: List[str], output_path: Path) -> None:
+    candidatos = np.flatnonzero(~es_entero)
+    if forbidden_values:
+        # Membresía con hashing de set: np.isin sobre dtype=object cae en un
+        # camino lento elemento a elemento, sin ventaja sobre el set directo.
+        candidatos = np.fromiter(
+            (i for i in candidatos.tolist() if values[i] not in forbidden_values),
+            dtype=candidatos.dtype,
+        )
+    if candidatos.size > faltan:
+        # choice sin reemplazo sustituye al shuffle + slice de la versión previa
+        candidatos = rng.choice(candidatos, size=faltan, replace=False)
+    nums = rng.integers(lo, hi + 1, size=candidatos.size)
+    for i, n in zip(candidatos.tolist(), nums.tolist()):
+        values[i] = str(n)
+
+def _finalize_column(vals: List[str], target_len: int,
+                     sanitize: bool = False,
+                     need_digits: int = 0,
+                     forbidden: Optional[Set[str]] = None,
+                     lo: int = 1, hi: int = 9999) -> List[str]:
+    """Cierra una columna en una sola etapa: saneado, largo exacto y mínimo de enteros."""
+    if sanitize:
+        # Prefiltro: el regex de combos solo cambia valores con guion (las
+        # formas pegadas se devuelven idénticas), así que el resto se copia
+        # tal cual sin invocar el motor de regex.
+        vals = [sanitizar_combos_letra_num(v, lo, hi) if "-" in v else v for v in vals]
+    out = pad_or_trim(vals, target_len)
+    if need_digits:
+        enforce_min_integers_inplace(out, need_digits, lo, hi, forbidden)
+    return out
+
+def save_csv(columns: Dict[str, List[str]], column_names: List[str], output_path: Path) -> None:
+    # Escritura columnar: las columnas ya vienen igualadas a TARGET_ROWS por
+    # pad_or_trim, así que zip(*cols) entrega las filas como tuplas directo a
+    # csv.writer, sin armar un dict intermedio por fila para DictWriter.
+    # Las columnas ausentes o vacías se emiten como campos vacíos con un
+    # repeat perezoso acotado a TARGET_ROWS: sin la cota, un dict sin ninguna
+    # columna real dejaría el zip infinito.
+    cols = [columns.get(name) or itertools.repeat("", TARGET_ROWS) for name in column_names]
+    # Camino rápido estilo df2csv: si ningún valor necesita comillado (sin
+    # comas, comillas ni saltos de línea), se escribe con un formato por
+    # línea precalculado y writelines, sin pasar por el módulo csv. Si algún
+    # valor lo requiere, csv.writer con QUOTE_MINIMAL comilla solo esos.
+    seguro = not any(
+        '"' in v or "," in v or "\n" in v or "\r" in v
+        for name in column_names for v in (columns.get(name) or ())
+    )
     with output_path.open("w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=column_names, quoting=csv.QUOTE_ALL)
-        writer.writeheader()
-        writer.writerows(rows)
+        if seguro:
+            f.write(",".join(column_names) + "\n")
+            line_fmt = ",".join(["%s"] * len(column_names)) + "\n"
+            f.writelines(line_fmt % fila for fila in zip(*cols))
+        else:
+            writer = csv.writer(f, quoting=csv.QUOTE_MINIMAL)
+            writer.writerow(column_names)
+            writer.writerows(zip(*cols))
 
-def main() -> None:
-    subfolders = discover_subfolders(SCRIPT_DIR)
-    if not subfolders:
-        raise RuntimeError("No se encontraron subcarpetas con archivos .txt")
+def process_folder(folder: Path) -> Tuple[str, List[str], Set[str]]:
+    """Genera los valores crudos de la columna de una subcarpeta.
 
-    columns: Dict[str, List[str]] = {}
-    letras_alfabeto = list(string.ascii_uppercase)
-    min_enteros = math.ceil(TARGET_ROWS / 3)
-    sin_numero_set: Set[str] = set()
+    Corre en un proceso worker: re-siembra el Generator del módulo con una
+    semilla derivada de (SEED, crc32 del nombre) para que el resultado sea
+    determinista e independiente del orden/reparto entre workers. No se usa
+    hash(): está salteado por proceso.
+    """
+    global rng
+    rng = np.random.default_rng([SEED, zlib.crc32(folder.name.encode())])
 
-    for folder in subfolders:
-        col_name = folder.name
-        base_map = read_subfolder_map(folder)
-        base_values: List[str] = []
+    col_name = folder.name
+    data = read_folder_data(folder)
+    base_values: List[str] = []
+    sin_numero_vals: Set[str] = set()
 
-        if "prioritarios.txt" in base_map:
-            total_prioritarios = len(base_map["prioritarios.txt"]) * PRIORITARIOS_N_VECES
-            if total_prioritarios > TARGET_ROWS:
-                raise ValueError(f"[!] {col_name}: se generan {total_prioritarios} valores desde prioritarios.txt > TARGET_ROWS={TARGET_ROWS}")
-            base_values.extend(base_map["prioritarios.txt"] * PRIORITARIOS_N_VECES)
+    if data.prioritarios:
+        total_prioritarios = len(data.prioritarios) * PRIORITARIOS_N_VECES
+        if total_prioritarios > TARGET_ROWS:
+            raise ValueError(f"[!] {col_name}: se generan {total_prioritarios} valores desde prioritarios.txt > TARGET_ROWS={TARGET_ROWS}")
+        base_values.extend(data.prioritarios * PRIORITARIOS_N_VECES)
 
-        for fname, vals in base_map.items():
-            if fname != "prioritarios.txt":
-                base_values.extend(vals)
+    for vals in data.others.values():
+        base_values.extend(vals)
 
-        if col_name in {"numero_exterior", "numero_interior"}:
-            valores_col: List[str] = []
+    if col_name not in {"numero_exterior", "numero_interior"}:
+        return col_name, base_values, sin_numero_vals
 
-            if col_name == "numero_exterior" and "sin_numero.txt" in base_map:
-                sin_numero_vals = base_map["sin_numero.txt"][:]
-                sin_numero_set.update(sin_numero_vals)
-                valores_col.extend(sin_numero_vals)
+    valores_col: List[str] = []
 
-            resto_vals: List[str] = []
-            for fname, vals in base_map.items():
-                if col_name == "numero_exterior" and fname == "sin_numero.txt":
-                    continue
-                resto_vals.extend(vals)
+    if col_name == "numero_exterior" and data.sin_numero:
+        sin_numero_vals.update(data.sin_numero)
+        valores_col.extend(data.sin_numero)
 
-            valores_col.extend(force_append_number(resto_vals, *RANGO_ENTEROS))
+    resto_vals: List[str] = list(data.prioritarios)
+    for fname, vals in data.others.items():
+        if col_name == "numero_exterior" and fname == "sin_numero.txt":
+            continue
+        resto_vals.extend(vals)
 
-            if col_name == "numero_interior":
-                valores_col.extend(build_combinations_from_txt(NUM_INT_PATTERNS, folder, 800, NUM_INT_RANGES))
+    # Los helpers escriben directo sobre valores_col (parámetro out):
+    # sin listas intermedias que luego haya que copiar con extend.
+    force_append_number(resto_vals, *RANGO_ENTEROS, out=valores_col)
 
-            valores_col.extend(generate_letter_number_combos(letras_alfabeto, COMBOS_LETRA_NUM_POR_COLUMNA, *RANGO_ENTEROS))
-            columns[col_name] = [sanitizar_combos_letra_num(v, *RANGO_ENTEROS) for v in valores_col]
-        else:
-            columns[col_name] = base_values
+    if col_name == "numero_interior":
+        build_combinations_from_txt(NUM_INT_PATTERNS, folder, 800, NUM_INT_RANGES, out=valores_col)
+
+    generate_letter_number_combos(list(string.ascii_uppercase), COMBOS_LETRA_NUM_POR_COLUMNA, *RANGO_ENTEROS, out=valores_col)
+    return col_name, valores_col, sin_numero_vals
+
+def main() -> None:
+    subfolders = discover_subfolders(SCRIPT_DIR)
+    if not subfolders:
+        raise RuntimeError("No se encontraron subcarpetas con archivos .txt")
 
-        print(f"✔ {col_name}: {len(columns[col_name])} valores generados")
+    columns: Dict[str, List[str]] = {}
+    min_enteros = math.ceil(TARGET_ROWS / 3)
+    sin_numero_set: Set[str] = set()
 
-    for required in FINAL_COLUMN_ORDER:
-        columns.setdefault(required, [])
+    # Cada subcarpeta es independiente (lecturas + RNG + armado de strings):
+    # se reparte una por worker y el proceso principal solo consolida.
+    workers = min(len(subfolders), os.cpu_count() or 1)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as ex:
+        for col_name, vals, snset in ex.map(process_folder, subfolders):
+            columns[col_name] = vals
+            sin_numero_set.update(snset)
+            print(f"✔ {col_name}: {len(vals)} valores generados")
+
+    # Las columnas numero_* se finalizan aunque no haya carpeta que las
+    # alimente: el mínimo de enteros debe garantizarse también sobre una
+    # columna vacía (que pad_or_trim deja en blancos antes del relleno).
+    for requerida in ("numero_exterior", "numero_interior"):
+        columns.setdefault(requerida, [])
 
     for name in list(columns.keys()):
-        columns[name] = pad_or_trim(columns[name], TARGET_ROWS)
-
-    enforce_min_integers_inplace(columns["numero_exterior"], min_enteros, *RANGO_ENTEROS, sin_numero_set)
-    enforce_min_integers_inplace(columns["numero_interior"], min_enteros, *RANGO_ENTEROS)
+        es_numero = name in {"numero_exterior", "numero_interior"}
+        columns[name] = _finalize_column(
+            columns[name], TARGET_ROWS,
+            sanitize=es_numero,
+            need_digits=min_enteros if es_numero else 0,
+            forbidden=sin_numero_set if name == "numero_exterior" else None,
+            lo=RANGO_ENTEROS[0], hi=RANGO_ENTEROS[1],
+        )
 
-    rows = build_table(columns, FINAL_COLUMN_ORDER)
-    save_csv(rows, FINAL_COLUMN_ORDER, OUTPUT_PATH)
+    assert all(len(columns[c]) == TARGET_ROWS for c in FINAL_COLUMN_ORDER if c in columns)
+    save_csv(columns, FINAL_COLUMN_ORDER, OUTPUT_PATH)
 
     print(f"\nCSV generado exitosamente: {OUTPUT_PATH}")
-    print(f"Filas: {len(rows)} | Columnas: {', '.join(FINAL_COLUMN_ORDER)}")
+    print(f"Filas: {TARGET_ROWS} | Columnas: {', '.join(FINAL_COLUMN_ORDER)}")
 
 if __name__ == "__main__":
     main()